@@ -37,12 +37,14 @@ class SimulationEngine(ABC):
         precision: int = 2,
         polarized: bool = False,
         eps: float = None,
-        upsample_factor: Literal[1.25, 2] = 2,
+        upsample_factor: Literal[1.25, 2] | None = None,
+        nufft_opts: dict | None = None,
         beam_spline_opts: dict = None,
         flat_array_tol: float = 0.0,
         interpolation_function: str = "az_za_map_coordinates",
         nprocesses: int | None = 1,
         nthreads: int | None = None,
+        nthreads_per_nufft: int | None = None,
         coord_method: Literal[
             "CoordinateRotationAstropy", "CoordinateRotationERFA"
         ] = "CoordinateRotationERFA",
@@ -92,11 +94,18 @@ class SimulationEngine(ABC):
             Desired accuracy of the non-uniform fast fourier transform. If None, the default accuracy
             for the given precision will be used. For precision 1, the default accuracy is 6e-8, and for
             precision 2, the default accuracy is 1e-12.
-        upsample_factor : default = 2
+        upsample_factor : default = None
             Upsampling factor for the non-uniform fast fourier transform. This is the factor by which the
-            intermediate grid is upsampled. Only values of 1.25 or 2 are allowed. Can be useful for decreasing
-            the computation time and memory requirement for large arrays at the expensive of some accuracy. 
-            The default value is 2.
+            intermediate grid is upsampled. Only values of 1.25 or 2 are allowed. A factor of 1.25 uses a
+            smaller fine grid (about 2.6 times less memory in 2D) and is usually faster, but requires a wider
+            spreading kernel and does not reach accuracies much below 1e-9. If None, 1.25 is used when
+            eps >= 1e-6 and 2 otherwise.
+        nufft_opts : dict, optional
+            Extra options passed to the finufft plans, e.g. ``{"spread_sort": 0}`` to
+            skip sorting the non-uniform points when there are only few sources, or
+            ``{"spread_thread": 2}``. See the finufft documentation for the available
+            options. These can't include the options set by fftvis (eps, nthreads,
+            upsampfac, modeord and dtype).
         beam_spline_opts : dict, optional
             Options to pass to :meth:`pyuvdata.uvbeam.UVBeam.interp` as `spline_opts`.
         flat_array_tol : float, default = 0.0
@@ -115,6 +124,13 @@ class SimulationEngine(ABC):
         nthreads : int, optional
             The number of threads to use for each process. If None, the number of threads
             will be set to the number of available CPUs divided by the number of processes.
+        nthreads_per_nufft : int, optional
+            The number of threads used by each non-uniform FFT. If None, each transform
+            uses all the threads of its process and integration times are evaluated one
+            after the other. If smaller than the number of threads per process, the
+            integration times of each process are evaluated concurrently, using
+            ``nthreads // nthreads_per_nufft`` threads. This is faster when the
+            individual transforms are too small to make use of many threads.
         coord_method : str, optional
             The method to use for coordinate rotation. Can be either 'CoordinateRotationAstropy'
             or 'CoordinateRotationERFA'. The former uses the astropy.coordinates package for
@@ -159,9 +175,11 @@ class SimulationEngine(ABC):
         polarized: bool = False,
         eps: float = None,
         upsample_factor: Literal[1.25, 2] = 2,
+        nufft_opts: dict = None,
         beam_spline_opts: dict = None,
         interpolation_function: str = "az_za_map_coordinates",
         n_threads: int = 1,
+        n_threads_per_nufft: int = None,
         is_coplanar: bool = False,
         basis_matrix: np.ndarray = None,
         type1_n_modes: int = None,
@@ -196,12 +214,18 @@ class SimulationEngine(ABC):
             Desired accuracy of the non-uniform fast fourier transform.
         upsample_factor : int
             Upsampling factor for the non-uniform FFT.
+        nufft_opts : dict, default = None
+            Extra options passed to the finufft plans.
         beam_spline_opts : dict, default = None
             Options for beam interpolation.
         interpolation_function : str
             The interpolation function to use for beam interpolation.
         n_threads : int
             Number of threads to use.
+        n_threads_per_nufft : int, default = None
+            Number of threads used by each non-uniform FFT. If smaller than n_threads,
+            integration times are evaluated concurrently by
+            ``n_threads // n_threads_per_nufft`` workers.
         is_coplanar : bool
             Whether the array is coplanar.
         basis_matrix : np.ndarray, default = None
@@ -216,6 +240,7 @@ class SimulationEngine(ABC):
         Returns
         -------
         np.ndarray
-            Chunk of visibility data.
+            Chunk of visibility data of shape (ntimes_chunk, nfreqs_chunk, nfeeds,
+            nfeeds, nbls).
         """
         pass
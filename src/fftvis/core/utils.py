@@ -23,46 +23,51 @@ def get_pos_reds(antpos, decimals=3, include_autos=True):
         reds: list of lists of redundant tuples of antenna indices (no polarizations),
         sorted by index with the first index of the first baseline the lowest in the group.
     """
-    # Create a dictionary of redundant baseline groups
-    uv_to_red_key = {}
-    reds = {}
+    ant_keys = list(antpos.keys())
+    antvecs = np.array([antpos[ant] for ant in ant_keys])
+    nants = len(ant_keys)
+
+    # Antenna index pairs in the same order as a double loop over the antennas
+    ai, aj = np.divmod(np.arange(nants**2), nants)
+    keys = np.array(ant_keys)
+    keep = keys[ai] < keys[aj]
+    if include_autos:
+        keep |= ai == aj
+    ai, aj = ai[keep], aj[keep]
+    if ai.size == 0:
+        return []
 
     # Compute baseline lengths and round to specified precision
-    baselines = np.round(
-        [
-            antpos[aj] - antpos[ai]
-            for ai in antpos
-            for aj in antpos
-            if ai < aj or include_autos and ai == aj
-        ],
-        decimals,
-    )
-
-    ci = 0
-    for ai in antpos:
-        for aj in antpos:
-            if ai < aj or include_autos and ai == aj:
-                u, v, _ = baselines[ci]
-
-                if (u, v) not in uv_to_red_key and (-u, -v) not in uv_to_red_key:
-                    reds[(ai, aj)] = [(ai, aj)]
-                    uv_to_red_key[(u, v)] = (ai, aj)
-                elif (-u, -v) in uv_to_red_key:
-                    reds[uv_to_red_key[(-u, -v)]].append((aj, ai))
-                elif (u, v) in uv_to_red_key:
-                    reds[uv_to_red_key[(u, v)]].append((ai, aj))
-
-                ci += 1
-
-    reds_list = []
-    for k in reds:
-        red = reds[k]
-        ant1, ant2 = red[0]
-        _, bly, _ = antpos[ant2] - antpos[ant1]
-        if bly < 0:
-            reds_list.append([(bl[1], bl[0]) for bl in red])
-        else:
-            reds_list.append(red)
+    uv = np.round(antvecs[aj] - antvecs[ai], decimals)[:, :2]
+
+    # Baselines and their conjugates share a key: flip every vector into the same
+    # half-plane (adding zero turns -0.0 into 0.0)
+    flip = (uv[:, 0] < 0) | ((uv[:, 0] == 0) & (uv[:, 1] < 0))
+    uv_key = np.where(flip[:, None], -uv, uv) + 0.0
+
+    # Groups are ordered by the first baseline found in each of them
+    _, first, group = np.unique(uv_key, axis=0, return_index=True, return_inverse=True)
+    group = np.argsort(np.argsort(first))[group.ravel()]
+    first = np.sort(first)
+
+    # A baseline is conjugated if it points opposite to the first one of its group
+    conj = np.all(uv == -uv[first[group]], axis=1)
+    conj[first] = False
+    ai, aj = np.where(conj, aj, ai), np.where(conj, ai, aj)
+
+    # Orient each group such that its first baseline has a non-negative y component
+    bly = antvecs[aj[first], 1] - antvecs[ai[first], 1]
+    reverse = (bly < 0)[group]
+    ai, aj = np.where(reverse, aj, ai), np.where(reverse, ai, aj)
+
+    # Collect the baselines of each group, keeping the order in which they were found
+    order = np.argsort(group, kind="stable")
+    bls = [
+        (ant_keys[i], ant_keys[j])
+        for i, j in zip(ai[order].tolist(), aj[order].tolist())
+    ]
+    ends = np.cumsum(np.bincount(group)).tolist()
+    reds_list = [bls[start:end] for start, end in zip([0] + ends[:-1], ends)]
 
     return reds_list
 
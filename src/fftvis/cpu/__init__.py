@@ -2,4 +2,4 @@
 
 from .beams import CPUBeamEvaluator
 from .cpu_simulate import CPUSimulationEngine
-from .nufft import cpu_nufft2d, cpu_nufft3d, cpu_nufft2d_type1
+from .nufft import cpu_nufft_plan, cpu_nufft2d, cpu_nufft3d, cpu_nufft2d_type1
@@ -56,8 +56,63 @@ class CPUBeamEvaluator(BeamEvaluator):
         # Save these for matvis compatibility
         self.polarized = polarized
         self.freq = freq
+
+        return self.evaluate_beam_freqs(
+            beam,
+            az,
+            za,
+            polarized,
+            np.atleast_1d(freq),
+            check=check,
+            spline_opts=spline_opts,
+            interpolation_function=interpolation_function,
+        )[0]
+
+    def evaluate_beam_freqs(
+        self,
+        beam: BeamInterface,
+        az: np.ndarray,
+        za: np.ndarray,
+        polarized: bool,
+        freqs: np.ndarray,
+        check: bool = False,
+        spline_opts: Optional[Dict] = None,
+        interpolation_function: str = "az_za_map_coordinates",
+    ) -> np.ndarray:
+        """Evaluate the beam on the CPU at several frequencies in a single call.
+
+        This avoids the per-call overhead of the beam interpolation (or analytic
+        evaluation) when the beam is needed at many frequencies for the same
+        source positions.
+
+        Parameters
+        ----------
+        beam
+            UVBeam object to evaluate.
+        az
+            Azimuth coordinates to evaluate the beam at.
+        za
+            Zenith angle coordinates to evaluate the beam at.
+        polarized
+            Whether to use beam polarization.
+        freqs
+            Array of frequencies to interpolate the beam to.
+        check
+            Whether to check that the beam has no inf/nan values.
+        spline_opts
+            Extra options to pass to interpolation functions.
+        interpolation_function
+            Interpolation function to use when interpolating the beam. See
+            :meth:`evaluate_beam`.
+
+        Returns
+        -------
+        np.ndarray
+            Interpolated beam values, of shape (nfreqs, nax, nfeeds, nsrc) if
+            polarized, otherwise (nfreqs, nsrc).
+        """
         self.spline_opts = spline_opts or {}
-        
+
         # Primary beam pattern using direct interpolation of UVBeam object
         kw = {
             "reuse_spline": True,
@@ -69,16 +124,16 @@ class CPUBeamEvaluator(BeamEvaluator):
         interp_beam = beam.compute_response(
             az_array=az,
             za_array=za,
-            freq_array=np.atleast_1d(freq),
+            freq_array=np.atleast_1d(freqs),
             **kw,
         )
 
         if polarized:
-            interp_beam = interp_beam[:, :, 0, :]
+            interp_beam = np.moveaxis(interp_beam, 2, 0)
         else:
             # Here we have already asserted that the beam is a power beam and
             # has only one polarization, so we just evaluate that one.
-            interp_beam = interp_beam[0, 0, 0, :]
+            interp_beam = interp_beam[0, 0]
 
         # Check for invalid beam values
         if check:
@@ -89,25 +144,29 @@ class CPUBeamEvaluator(BeamEvaluator):
         return interp_beam
 
     @staticmethod
-    @nb.jit(nopython=True, parallel=False, nogil=False)
+    @nb.jit(nopython=True, parallel=False, nogil=True)
     def get_apparent_flux_polarized_beam(beam: np.ndarray, flux: np.ndarray):  # pragma: no cover
         """Calculate apparent flux of the sources. """
         nax, nfd, nsrc = beam.shape
 
         for isrc in range(nsrc):
-            c = np.conj(beam[:, :, isrc])
+            b00 = beam[0, 0, isrc]
+            b01 = beam[0, 1, isrc]
+            b10 = beam[1, 0, isrc]
+            b11 = beam[1, 1, isrc]
 
-            i00 = c[0, 0] * beam[0, 0, isrc] + c[1, 0] * beam[1, 0, isrc]
-            i01 = c[0, 0] * beam[0, 1, isrc] + c[1, 0] * beam[1, 1, isrc]
+            # The diagonal terms are |A|^2 sums, so only compute the real part
+            i00 = b00.real**2 + b00.imag**2 + b10.real**2 + b10.imag**2
+            i11 = b01.real**2 + b01.imag**2 + b11.real**2 + b11.imag**2
+            i01 = np.conj(b00) * b01 + np.conj(b10) * b11
 
-            i11 = c[0, 1] * beam[0, 1, isrc] + c[1, 1] * beam[1, 1, isrc]
             beam[0, 0, isrc] = i00 * flux[isrc]
             beam[0, 1, isrc] = i01 * flux[isrc]
             beam[1, 0, isrc] = np.conj(i01) * flux[isrc]
             beam[1, 1, isrc] = i11 * flux[isrc]
 
     @staticmethod
-    @nb.jit(nopython=True, parallel=False, nogil=False)
+    @nb.jit(nopython=True, parallel=False, nogil=True)
     def get_apparent_flux_polarized(beam, coherency):
         """
         Calculate the apparent flux of the sources using the beam and coherency matrices.
@@ -5,6 +5,10 @@ This module provides a concrete implementation of the simulation engine for CPU.
 """
 
 from multiprocessing import cpu_count
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import lru_cache
+import threading
 import ray
 from threadpoolctl import threadpool_limits
 import os
@@ -27,12 +31,95 @@ from .. import utils
 
 # Import the CPU beam evaluator
 from .beams import CPUBeamEvaluator
-from .nufft import cpu_nufft2d, cpu_nufft3d, cpu_nufft2d_type1
+from .nufft import cpu_nufft_plan, cpu_nufft2d, cpu_nufft3d, cpu_nufft2d_type1
 from . import utils as cpu_utils
 logger = logging.getLogger(__name__)
 
-# Create a global instance of CPUBeamEvaluator to use for beam evaluation
-_cpu_beam_evaluator = CPUBeamEvaluator()
+# Maximum size (in bytes) of the beam values evaluated at once for a block of
+# frequencies in a single time step.
+_max_beam_block_bytes = 256 * 1024**2
+
+
+def _get_scratch(
+    workspace: threading.local, name: str, shape: tuple, dtype: np.dtype
+) -> np.ndarray:
+    """
+    Get a contiguous scratch array, reusing the buffer stored in the workspace.
+
+    The buffer is only reallocated if it is too small or has a different dtype,
+    so that the scratch arrays of a worker are allocated once instead of for
+    every time and frequency.
+
+    Parameters
+    ----------
+    workspace : threading.local
+        Per-thread storage holding the scratch buffers.
+    name : str
+        Name of the buffer in the workspace.
+    shape : tuple
+        Shape of the requested array.
+    dtype : np.dtype
+        Data type of the requested array.
+
+    Returns
+    -------
+    np.ndarray
+        Uninitialized array of the given shape and dtype.
+    """
+    size = int(np.prod(shape))
+    buffer = getattr(workspace, name, None)
+    if buffer is None or buffer.size < size or buffer.dtype != dtype:
+        buffer = np.empty(size, dtype=dtype)
+        setattr(workspace, name, buffer)
+    return buffer[:size].reshape(shape)
+
+
+def _layout_to_antpos(ant_keys: tuple, antpos_bytes: bytes) -> dict:
+    """Rebuild the antenna position dictionary from a cache key."""
+    antvecs = np.frombuffer(antpos_bytes, dtype=float).reshape(len(ant_keys), -1)
+    return dict(zip(ant_keys, antvecs))
+
+
+@lru_cache(maxsize=8)
+def _get_redundant_baselines(ant_keys: tuple, antpos_bytes: bytes) -> tuple:
+    """
+    Get the first baseline of each redundant group of an array.
+
+    The result is cached, so that repeated simulations of the same array (e.g.
+    for different frequencies or sources) don't need to find the redundant
+    groups again.
+
+    Parameters
+    ----------
+    ant_keys : tuple
+        Antenna numbers of the array.
+    antpos_bytes : bytes
+        Raw bytes of the float64 antenna positions, of shape (nants, 3).
+
+    Returns
+    -------
+    tuple
+        The first baseline of each redundant group, including autos.
+    """
+    antpos = _layout_to_antpos(ant_keys, antpos_bytes)
+    return tuple(red[0] for red in utils.get_pos_reds(antpos, include_autos=True))
+
+
+@lru_cache(maxsize=8)
+def _check_antpos_griddability(ant_keys: tuple, antpos_bytes: bytes) -> tuple:
+    """
+    Cached version of :func:`check_antpos_griddability`.
+
+    The returned arrays are shared between calls and are therefore read-only.
+    See :func:`_get_redundant_baselines` for the parameters.
+    """
+    is_gridded, gridded_antpos, basis_matrix = check_antpos_griddability(
+        _layout_to_antpos(ant_keys, antpos_bytes)
+    )
+    basis_matrix.flags.writeable = False
+    for antvec in gridded_antpos.values():
+        antvec.flags.writeable = False
+    return is_gridded, gridded_antpos, basis_matrix
 
 
 # Define a standalone function for Ray to use with remote
@@ -51,9 +138,11 @@ def _evaluate_vis_chunk_remote(
     polarized_sky_model: bool = False,
     eps: float = None,
     upsample_factor: Literal[1.25, 2] = 2,
+    nufft_opts: dict = None,
     beam_spline_opts: dict = None,
     interpolation_function: str = "az_za_map_coordinates",
     n_threads: int = 1,
+    n_threads_per_nufft: int = None,
     is_coplanar: bool = False,
     use_type1: bool = False,
     basis_matrix: np.ndarray = None,
@@ -78,9 +167,11 @@ def _evaluate_vis_chunk_remote(
         polarized_sky_model=polarized_sky_model,
         eps=eps,
         upsample_factor=upsample_factor,
+        nufft_opts=nufft_opts,
         beam_spline_opts=beam_spline_opts,
         interpolation_function=interpolation_function,
         n_threads=n_threads,
+        n_threads_per_nufft=n_threads_per_nufft,
         is_coplanar=is_coplanar,
         use_type1=use_type1,
         basis_matrix=basis_matrix,
@@ -106,12 +197,14 @@ class CPUSimulationEngine(SimulationEngine):
         precision: int = 2,
         polarized: bool = False,
         eps: float = None,
-        upsample_factor: Literal[1.25, 2] = 2,
+        upsample_factor: Literal[1.25, 2] | None = None,
+        nufft_opts: dict | None = None,
         beam_spline_opts: dict = None,
         flat_array_tol: float = 1e-6,
         interpolation_function: str = "az_za_map_coordinates",
         nprocesses: int | None = 1,
         nthreads: int | None = None,
+        nthreads_per_nufft: int | None = None,
         coord_method: Literal[
             "CoordinateRotationAstropy", "CoordinateRotationERFA"
         ] = "CoordinateRotationERFA",
@@ -142,6 +235,11 @@ class CPUSimulationEngine(SimulationEngine):
         if eps is None:
             eps = default_accuracy_dict[precision]
 
+        # The smaller upsampling factor is faster and uses less memory, but can't
+        # reach high accuracies
+        if upsample_factor is None:
+            upsample_factor = 1.25 if eps >= 1e-6 else 2
+
         if ra.dtype != real_dtype:
             ra = ra.astype(real_dtype)
         if dec.dtype != real_dtype:
@@ -149,10 +247,16 @@ class CPUSimulationEngine(SimulationEngine):
         if freqs.dtype != real_dtype:
             freqs = freqs.astype(real_dtype)
 
+        # The array layout analysis only depends on the antenna positions, so it
+        # is cached between calls with the same array.
+        layout_key = (
+            tuple(ants.keys()),
+            np.array([ants[ant] for ant in ants], dtype=float).tobytes(),
+        )
+
         # Get the redundant groups
         if baselines is None:
-            reds = utils.get_pos_reds(ants, include_autos=True)
-            baselines = [red[0] for red in reds]
+            baselines = list(_get_redundant_baselines(*layout_key))
 
         # Get number of baselines
         nbls = len(baselines)
@@ -168,11 +272,23 @@ class CPUSimulationEngine(SimulationEngine):
         antkey_to_idx = dict(zip(ants.keys(), range(len(ants))))
         antvecs = np.array([ants[ant] for ant in ants], dtype=real_dtype)
 
+        # Indices of the two antennas of each baseline in the antenna arrays
+        ant_1_idx, ant_2_idx = (
+            np.array(
+                [(antkey_to_idx[bl[0]], antkey_to_idx[bl[1]]) for bl in baselines],
+                dtype=np.intp,
+            )
+            .reshape(-1, 2)
+            .T
+        )
+
         # If the array is flat within tolerance, we can check for griddability
         if np.abs(antvecs[:, -1]).max() > flat_array_tol or force_use_type3:
             is_gridded = False
         else:
-            is_gridded, gridded_antpos, basis_matrix = check_antpos_griddability(ants)
+            is_gridded, gridded_antpos, basis_matrix = _check_antpos_griddability(
+                *layout_key
+            )
                 
         # Rotate antenna positions to XY plane if not gridded
         if not is_gridded:
@@ -180,15 +296,10 @@ class CPUSimulationEngine(SimulationEngine):
             rotation_matrix = utils.get_plane_to_xy_rotation_matrix(antvecs)
             rotation_matrix = np.ascontiguousarray(rotation_matrix.T)
             rotated_antvecs = np.dot(rotation_matrix, antvecs.T)
-            rotated_ants = {
-                ant: rotated_antvecs[:, antkey_to_idx[ant]] for ant in ants
-            }
             rotation_matrix = rotation_matrix.astype(real_dtype)
         
             # Compute baseline vectors and convert to speed of light units
-            bls = np.array([rotated_ants[bl[1]] - rotated_ants[bl[0]] for bl in baselines])[
-                :, :
-            ].T
+            bls = rotated_antvecs[:, ant_2_idx] - rotated_antvecs[:, ant_1_idx]
             bls /= utils.speed_of_light
             bls = bls.astype(real_dtype)
 
@@ -199,18 +310,15 @@ class CPUSimulationEngine(SimulationEngine):
                 "Using gridded coordinates for the array. Type 1 transform will be used."
             )
             # Compute the baseline vectors in the gridded coordinate system
-            bls = np.array([
-                gridded_antpos[bl[1]] - gridded_antpos[bl[0]] 
-                for bl in baselines]
-            ).T
+            gridded_antvecs = np.array([gridded_antpos[ant] for ant in ants]).T
+            bls = gridded_antvecs[:, ant_2_idx] - gridded_antvecs[:, ant_1_idx]
             bls = np.round(bls).astype(int)
             
             # Find the maximum extent of the array in gridded coordinates
             n_modes = 2 * int(np.round(np.max(np.abs(bls)))) + 1
 
             # Get the maximum baseline length for proper coordinate scaling
-            basis_matrix *= 1 / utils.speed_of_light
-            basis_matrix = basis_matrix.astype(real_dtype)
+            basis_matrix = (basis_matrix / utils.speed_of_light).astype(real_dtype)
 
             # Assume the array is coplanar for gridded coordinates
             is_coplanar = True
@@ -344,9 +452,11 @@ class CPUSimulationEngine(SimulationEngine):
                     polarized_sky_model=polarized_sky_model,
                     eps=eps,
                     upsample_factor=upsample_factor,
+                    nufft_opts=nufft_opts,
                     beam_spline_opts=beam_spline_opts,
                     interpolation_function=interpolation_function,
                     n_threads=nthi,
+                    n_threads_per_nufft=nthreads_per_nufft,
                     is_coplanar=is_coplanar,
                     use_type1=is_gridded,
                     basis_matrix=basis_matrix if is_gridded else None,
@@ -366,19 +476,22 @@ class CPUSimulationEngine(SimulationEngine):
         end_time = time.time()
         logger.info(f"Main loop evaluation time: {end_time - init_time}")
 
-        # Combine results from all workers
-        vis = np.zeros(
-            dtype=complex_dtype, shape=(ntimes, nbls, nfeeds, nfeeds, nfreqs)
-        )
-        for fc, tc, future in zip(freq_chunks, time_chunks, futures):
-            vis[tc][..., fc] = future
-
-        # Reshape to expected output format
-        return (
-            np.transpose(vis, (4, 0, 2, 3, 1))
-            if polarized
-            else np.moveaxis(vis[..., 0, 0, :], 2, 0)
-        )
+        # Combine results from all workers directly into the output format, so
+        # that the returned array is contiguous. The chunks hold the feed pairs in
+        # the order of the NUFFT output, which is the transpose of the output
+        # feed order.
+        if polarized:
+            vis = np.zeros(
+                dtype=complex_dtype, shape=(nfreqs, ntimes, nfeeds, nfeeds, nbls)
+            )
+            for fc, tc, future in zip(freq_chunks, time_chunks, futures):
+                vis[fc, tc] = np.transpose(future, (1, 0, 3, 2, 4))
+        else:
+            vis = np.zeros(dtype=complex_dtype, shape=(nfreqs, ntimes, nbls))
+            for fc, tc, future in zip(freq_chunks, time_chunks, futures):
+                vis[fc, tc] = np.swapaxes(future[:, :, 0, 0], 0, 1)
+
+        return vis
 
     def _evaluate_vis_chunk(
         self,
@@ -395,9 +508,11 @@ class CPUSimulationEngine(SimulationEngine):
         polarized_sky_model: bool = False,
         eps: float = None,
         upsample_factor: Literal[1.25, 2] = 2,
+        nufft_opts: dict = None,
         beam_spline_opts: dict = None,
         interpolation_function: str = "az_za_map_coordinates",
         n_threads: int = 1,
+        n_threads_per_nufft: int = None,
         is_coplanar: bool = False,
         use_type1: bool = False,
         basis_matrix: float = None,
@@ -421,145 +536,408 @@ class CPUSimulationEngine(SimulationEngine):
 
         nt_here = len(coord_mgr.times[time_idx])
         nf_here = len(freqs[freq_idx])
+        # The visibilities of each time and frequency are contiguous, so that the
+        # NUFFTs can write into them directly.
         vis = np.zeros(
-            dtype=complex_dtype, shape=(nt_here, nbls, nfeeds, nfeeds, nf_here)
+            dtype=complex_dtype, shape=(nt_here, nf_here, nfeeds, nfeeds, nbls)
         )
 
         coord_mgr.setup()
 
-        # Check to see if the rotation matrix is an identity matrix
-        is_rotation_identity = np.allclose(rotation_matrix, np.eye(3))
+        # Fold the array rotation, the lattice basis (type 1 only) and the 2 pi of the
+        # transform into a single matrix, so that the sources only need to be
+        # transformed once per time.
+        source_transform = 2 * np.pi * rotation_matrix
+        if basis_matrix is not None:
+            source_transform = np.dot(basis_matrix.T, source_transform)
+        source_transform = np.ascontiguousarray(
+            source_transform, dtype=rotation_matrix.dtype
+        )
+
+        # Flat type 3 arrays usually need no rotation, in which case the sources
+        # are only scaled by 2 pi.
+        if basis_matrix is None and np.allclose(rotation_matrix, np.eye(3)):
+            source_transform = None
+
+        if eps is None:
+            eps = default_accuracy_dict[1 if complex_dtype == np.complex64 else 2]
+
+        # The flat indices of the baselines in the type 1 transform (or the
+        # baseline coordinates at each frequency for type 3) are the same for
+        # every time, so compute them once.
+        if use_type1:
+            type1_index = np.ravel_multi_index(
+                bls[:2], (type1_n_modes, type1_n_modes), mode="wrap"
+            ).astype(np.intp)
+            uvw = None
+        else:
+            type1_index = None
+            # bls isn't C-ordered, so make the rows of the table contiguous for
+            # the plans
+            uvw = np.ascontiguousarray(freqs[freq_idx, None, None] * bls)
+
+        # Split the threads of this process between the NUFFTs and the number of
+        # integration times that are evaluated concurrently.
+        n_threads_per_nufft = max(min(n_threads_per_nufft or n_threads, n_threads), 1)
+        n_time_workers = max(n_threads // n_threads_per_nufft, 1)
+
+        # Finufft plans can't be shared between threads, so each worker keeps its
+        # own plan and scratch buffers (created on first use) in thread-local
+        # storage.
+        workspace = threading.local()
+        step_kwargs = dict(
+            workspace=workspace,
+            beam=beam,
+            nbls=nbls,
+            uvw=uvw,
+            type1_index=type1_index,
+            freqs=freqs,
+            freq_idx=freq_idx,
+            complex_dtype=complex_dtype,
+            nfeeds=nfeeds,
+            source_transform=source_transform,
+            polarized=polarized,
+            polarized_sky_model=polarized_sky_model,
+            eps=eps,
+            upsample_factor=upsample_factor,
+            nufft_opts=nufft_opts,
+            beam_spline_opts=beam_spline_opts,
+            interpolation_function=interpolation_function,
+            n_threads=n_threads_per_nufft,
+            is_coplanar=is_coplanar,
+            use_type1=use_type1,
+            type1_n_modes=type1_n_modes,
+        )
+
+        # The flux of the sources above the horizon is gathered for the
+        # frequencies of this chunk with the frequencies first and the sources
+        # last, so that the flux of each frequency is contiguous.
+        flux_axes = (1, 2, 3, 0) if polarized_sky_model else (1, 0)
 
         with threadpool_limits(limits=n_threads, user_api="blas"):
-            for time_index, ti in enumerate(range(ntimes)[time_idx]):
-                coord_mgr.rotate(ti)
-                topo, flux, nsim_sources = coord_mgr.select_chunk(0, ti)
+            if n_time_workers == 1:
+                for time_index, ti in enumerate(range(ntimes)[time_idx]):
+                    coord_mgr.rotate(ti)
+                    topo, flux, nsim_sources = coord_mgr.select_chunk(0, ti)
 
-                # truncate to nsim_sources
-                topo = topo[:, :nsim_sources]
-                flux = flux[:nsim_sources]
+                    if nsim_sources == 0:
+                        continue
 
-                if nsim_sources == 0:
-                    continue
+                    flux_here = np.transpose(flux[:nsim_sources, freq_idx], flux_axes)
+                    flux_table = _get_scratch(
+                        workspace, "flux_table", flux_here.shape, flux_here.dtype
+                    )
+                    np.copyto(flux_table, flux_here)
 
-                # Compute azimuth and zenith angles
-                az, za = coordinates.enu_to_az_za(
-                    enu_e=topo[0], enu_n=topo[1], orientation="uvbeam"
+                    self._evaluate_time_step(
+                        vis[time_index],
+                        topo[:, :nsim_sources],
+                        flux_table,
+                        **step_kwargs,
+                    )
+            else:
+                logger.info(
+                    f"Evaluating {n_time_workers} times concurrently with "
+                    f"{n_threads_per_nufft} threads per NUFFT."
                 )
-
-                # Rotate source coordinates with rotation matrix.
-                if not is_rotation_identity:
-                    cpu_utils.inplace_rot(rotation_matrix, topo)
-                
-                # Rotate the basis matrix
-                if basis_matrix is not None:
-                    # Rotate antenna positions with basis matrix
-                    cpu_utils.inplace_rot(basis_matrix.T, topo)
-
-                topo *= 2 * np.pi
-
-                for freqidx in range(nfreqs)[freq_idx]:
-                    freq = freqs[freqidx]
-
-                    if not use_type1:
-                        uvw = bls * freq
-
-                    # Update beam evaluator for matvis compatibility
-                    _cpu_beam_evaluator.beam_list = [beam]
-                    _cpu_beam_evaluator.nsrc = len(az)
-                    _cpu_beam_evaluator.polarized = polarized
-                    _cpu_beam_evaluator.freq = freq
-
-                    apparent_coherency = _cpu_beam_evaluator.evaluate_beam(
-                        beam,
-                        az,
-                        za,
-                        polarized,
-                        freq,
-                        spline_opts=beam_spline_opts,
-                        interpolation_function=interpolation_function,
-                    ).astype(complex_dtype)
-
-                    if polarized and polarized_sky_model:
-                        logger.info(
-                            "Using polarized sky model. "
-                            "Computing apparent flux for polarized sources."
-                        )
-                        # Flip to match the expected order
-                        apparent_coherency = np.flip(apparent_coherency, axis=0)
-            
-                        # Compute the polarized apparent flux
-                        _cpu_beam_evaluator.get_apparent_flux_polarized(
-                            apparent_coherency, np.transpose(flux[:nsim_sources, freqidx], (1, 2, 0))
-                        )
-                    elif polarized:
-                        logger.info(
-                            "Using polarized beam. "
-                            "Computing apparent flux for unpolarized sources."
-                        )
-                        _cpu_beam_evaluator.get_apparent_flux_polarized_beam(
-                            apparent_coherency, flux[:nsim_sources, freqidx]
-                        )
-                    else:
-                        logger.info(
-                            "Using unpolarized beam. "
-                            "Computing apparent flux for unpolarized sources."
-                        )
-                        apparent_coherency *= flux[:nsim_sources, freqidx]
-                    
-                    # Try to reshape safely
-                    try:
-                        apparent_coherency = np.reshape(
-                            apparent_coherency, (nfeeds**2, nsim_sources)
-                        )
-                        pass
-                    except ValueError: # pragma: no cover
-                        logger.error(f"Cannot reshape A_s with shape {apparent_coherency.shape} to {(nfeeds**2, nsim_sources)}") # pragma: no cover
-                        continue # pragma: no cover
-                    
-                    # Check if the dtype is complex
-                    if apparent_coherency.dtype != complex_dtype:
-                        apparent_coherency = apparent_coherency.astype(complex_dtype)
-
-                    # Compute visibilities w/ non-uniform FFT
-                    if use_type1:
-                        _vis_here = cpu_nufft2d_type1(
-                            topo[0] * freq,
-                            topo[1] * freq,
-                            apparent_coherency,
-                            n_modes=type1_n_modes,
-                            index=bls,
-                            eps=eps,
-                            n_threads=n_threads,
-                            upsample_factor=upsample_factor,
-                        )
-                    else:
-                        if is_coplanar:
-                            _vis_here = cpu_nufft2d(
-                                topo[0],
-                                topo[1],
-                                apparent_coherency,
-                                uvw[0],
-                                uvw[1],
-                                eps=eps,
-                                n_threads=n_threads,
-                                upsample_factor=upsample_factor,
-                            )
-                        else:
-                            _vis_here = cpu_nufft3d(
-                                topo[0],
-                                topo[1],
-                                topo[2],
-                                apparent_coherency,
-                                uvw[0],
-                                uvw[1],
-                                uvw[2],
-                                eps=eps,
-                                n_threads=n_threads,
-                                upsample_factor=upsample_factor,
+                pending = deque()
+                with ThreadPoolExecutor(max_workers=n_time_workers) as pool:
+                    for time_index, ti in enumerate(range(ntimes)[time_idx]):
+                        coord_mgr.rotate(ti)
+                        topo, flux, nsim_sources = coord_mgr.select_chunk(0, ti)
+
+                        if nsim_sources == 0:
+                            continue
+
+                        # Bound the number of source copies waiting for a worker
+                        if len(pending) >= 2 * n_time_workers:
+                            pending.popleft().result()
+
+                        # The coordinate manager reuses its buffers for the next
+                        # time, so each task gets its own copy of the sources.
+                        # The transposed flux can already be contiguous (e.g. for
+                        # a single frequency), so it is always copied explicitly.
+                        pending.append(
+                            pool.submit(
+                                self._evaluate_time_step,
+                                vis[time_index],
+                                topo[:, :nsim_sources].copy(),
+                                np.transpose(
+                                    flux[:nsim_sources, freq_idx], flux_axes
+                                ).copy(),
+                                **step_kwargs,
                             )
-                    vis[time_index, ..., freqidx] = np.swapaxes(
-                        _vis_here.reshape(nfeeds, nfeeds, nbls), 2, 0
-                    )
+                        )
+
+                    for future in pending:
+                        future.result()
 
         return vis
+
+    def _evaluate_time_step(
+        self,
+        vis: np.ndarray,
+        topo: np.ndarray,
+        flux: np.ndarray,
+        workspace: threading.local,
+        beam,
+        nbls: int,
+        uvw: np.ndarray,
+        type1_index: np.ndarray,
+        freqs: np.ndarray,
+        freq_idx: slice,
+        complex_dtype: np.dtype,
+        nfeeds: int,
+        source_transform: np.ndarray,
+        polarized: bool = False,
+        polarized_sky_model: bool = False,
+        eps: float = None,
+        upsample_factor: Literal[1.25, 2] = 2,
+        nufft_opts: dict = None,
+        beam_spline_opts: dict = None,
+        interpolation_function: str = "az_za_map_coordinates",
+        n_threads: int = 1,
+        is_coplanar: bool = False,
+        use_type1: bool = False,
+        type1_n_modes: int = None,
+    ):
+        """
+        Evaluate the visibilities of a single integration time in place.
+
+        Parameters
+        ----------
+        vis : np.ndarray
+            Output array for this time of shape (nfreqs_chunk, nfeeds, nfeeds, nbls),
+            with the feed pairs in the order of the NUFFT output.
+        topo : np.ndarray
+            Topocentric coordinates of the sources above the horizon, of shape
+            (3, nsources). Modified in place.
+        flux : np.ndarray
+            Coherency of the sources above the horizon for every frequency of the
+            chunk, of shape (nfreqs_chunk, nsources) or, for polarized sky models,
+            (nfreqs_chunk, 2, 2, nsources).
+        workspace : threading.local
+            Per-thread storage holding the finufft plans, beam evaluator and scratch
+            buffers of the calling thread.
+        nbls : int
+            Number of baselines.
+        uvw : np.ndarray
+            Baseline coordinates at each frequency of the chunk, of shape
+            (nfreqs_chunk, 3, nbls), in units of wavelengths. Only used for type 3
+            transforms.
+        type1_index : np.ndarray
+            Flat indices of the baselines in the type 1 transform. Only used for
+            type 1 transforms.
+        source_transform : np.ndarray
+            Matrix transforming the topocentric source coordinates into the frame
+            of the baselines, or None if the transform is only a scaling by 2 pi.
+
+        See :meth:`_evaluate_vis_chunk` for the remaining parameters.
+        """
+        nsim_sources = topo.shape[1]
+
+        # The plan is reused for every time and frequency handled by this
+        # thread, only the non-uniform points are updated.
+        if use_type1:
+            type1_plan = getattr(workspace, "type1_plan", None)
+            if type1_plan is None:
+                type1_plan = workspace.type1_plan = cpu_nufft_plan(
+                    1,
+                    (type1_n_modes, type1_n_modes),
+                    n_trans=nfeeds**2,
+                    eps=eps,
+                    dtype=complex_dtype,
+                    n_threads=n_threads,
+                    upsample_factor=upsample_factor,
+                    nufft_opts=nufft_opts,
+                )
+        else:
+            type3_plan = getattr(workspace, "type3_plan", None)
+            if type3_plan is None:
+                type3_plan = workspace.type3_plan = cpu_nufft_plan(
+                    3,
+                    2 if is_coplanar else 3,
+                    n_trans=nfeeds**2,
+                    eps=eps,
+                    dtype=complex_dtype,
+                    n_threads=n_threads,
+                    upsample_factor=upsample_factor,
+                    nufft_opts=nufft_opts,
+                )
+
+        # Compute azimuth and zenith angles
+        az, za = coordinates.enu_to_az_za(
+            enu_e=topo[0], enu_n=topo[1], orientation="uvbeam"
+        )
+
+        # Rotate source coordinates into the frame of the baselines
+        if source_transform is None:
+            topo *= 2 * np.pi
+        else:
+            cpu_utils.inplace_rot(source_transform, topo)
+
+        # Each worker has its own beam evaluator, since its attributes are
+        # updated for every time step (for matvis compatibility)
+        beam_evaluator = getattr(workspace, "beam_evaluator", None)
+        if beam_evaluator is None:
+            beam_evaluator = workspace.beam_evaluator = CPUBeamEvaluator()
+        beam_evaluator.beam_list = [beam]
+        beam_evaluator.nsrc = len(az)
+        beam_evaluator.polarized = polarized
+
+        # The beam is evaluated for a block of frequencies at once, with the
+        # block size limited so that the beam values stay within a memory budget.
+        chunk_freqs = freqs[freq_idx]
+        nf_here = len(chunk_freqs)
+        bytes_per_freq = np.dtype(complex_dtype).itemsize * nfeeds**2 * nsim_sources
+        freq_block = int(
+            np.clip(_max_beam_block_bytes // max(bytes_per_freq, 1), 1, nf_here)
+        )
+
+        real_dtype = np.finfo(complex_dtype).dtype
+        if not polarized:
+            flux_buffer = _get_scratch(
+                workspace, "flux_buffer", (nsim_sources,), complex_dtype
+            )
+        if use_type1:
+            # Source coordinates scaled to each frequency
+            scaled_topo = _get_scratch(
+                workspace, "scaled_topo", (2, nsim_sources), topo.dtype
+            )
+            # Full transform, from which the modes of the baselines are taken
+            type1_model = _get_scratch(
+                workspace,
+                "type1_model",
+                (nfeeds**2, type1_n_modes, type1_n_modes),
+                complex_dtype,
+            )
+
+        for fi, freq in enumerate(chunk_freqs):
+
+            if fi % freq_block == 0:
+                beam_evaluator.freq = chunk_freqs[fi : fi + freq_block]
+                beam_block = beam_evaluator.evaluate_beam_freqs(
+                    beam,
+                    az,
+                    za,
+                    polarized,
+                    chunk_freqs[fi : fi + freq_block],
+                    spline_opts=beam_spline_opts,
+                    interpolation_function=interpolation_function,
+                )
+                if polarized and polarized_sky_model:
+                    # Flip the axes to match the expected order. This is done
+                    # in the same (contiguous) copy as the cast below, so that
+                    # the apparent flux can be reshaped without another copy.
+                    beam_block = beam_block[:, ::-1]
+
+                # Power beams are real, so they are kept real and only combined
+                # with the (complex) flux when the apparent flux is computed.
+                beam_dtype = (
+                    real_dtype
+                    if not polarized and np.isrealobj(beam_block)
+                    else complex_dtype
+                )
+
+                # The beam block is usually a new contiguous array already, so it
+                # is only copied into the scratch buffer if its axes were moved or
+                # it needs a cast.
+                if not (
+                    beam_block.flags.c_contiguous and beam_block.dtype == beam_dtype
+                ):
+                    beam_buffer = _get_scratch(
+                        workspace, "beam_buffer", beam_block.shape, beam_dtype
+                    )
+                    np.copyto(beam_buffer, beam_block)
+                    beam_block = beam_buffer
+
+            apparent_coherency = beam_block[fi % freq_block]
+
+            if polarized and polarized_sky_model:
+                logger.info(
+                    "Using polarized sky model. "
+                    "Computing apparent flux for polarized sources."
+                )
+                # Compute the polarized apparent flux
+                beam_evaluator.get_apparent_flux_polarized(
+                    apparent_coherency, flux[fi]
+                )
+            elif polarized:
+                logger.info(
+                    "Using polarized beam. "
+                    "Computing apparent flux for unpolarized sources."
+                )
+                beam_evaluator.get_apparent_flux_polarized_beam(
+                    apparent_coherency, flux[fi]
+                )
+            else:
+                logger.info(
+                    "Using unpolarized beam. "
+                    "Computing apparent flux for unpolarized sources."
+                )
+                # Fused multiplication into a buffer that is reused for all
+                # frequencies of this time step
+                apparent_coherency = np.multiply(
+                    apparent_coherency, flux[fi], out=flux_buffer
+                )
+            
+            # Try to reshape safely
+            try:
+                apparent_coherency = np.reshape(
+                    apparent_coherency, (nfeeds**2, nsim_sources)
+                )
+                pass
+            except ValueError: # pragma: no cover
+                logger.error(f"Cannot reshape A_s with shape {apparent_coherency.shape} to {(nfeeds**2, nsim_sources)}") # pragma: no cover
+                continue # pragma: no cover
+            
+            # Check if the dtype is complex
+            if apparent_coherency.dtype != complex_dtype:
+                apparent_coherency = apparent_coherency.astype(complex_dtype)
+
+            # Compute visibilities w/ non-uniform FFT, directly into the output
+            vis_out = vis[fi].reshape(nfeeds**2, nbls)
+            if use_type1:
+                np.multiply(topo[:2], freq, out=scaled_topo)
+                cpu_nufft2d_type1(
+                    scaled_topo[0],
+                    scaled_topo[1],
+                    apparent_coherency,
+                    n_modes=type1_n_modes,
+                    index=type1_index,
+                    eps=eps,
+                    n_threads=n_threads,
+                    upsample_factor=upsample_factor,
+                    plan=type1_plan,
+                    out=vis_out,
+                    model_out=type1_model,
+                )
+            else:
+                if is_coplanar:
+                    cpu_nufft2d(
+                        topo[0],
+                        topo[1],
+                        apparent_coherency,
+                        uvw[fi, 0],
+                        uvw[fi, 1],
+                        eps=eps,
+                        n_threads=n_threads,
+                        upsample_factor=upsample_factor,
+                        plan=type3_plan,
+                        out=vis_out,
+                    )
+                else:
+                    cpu_nufft3d(
+                        topo[0],
+                        topo[1],
+                        topo[2],
+                        apparent_coherency,
+                        uvw[fi, 0],
+                        uvw[fi, 1],
+                        uvw[fi, 2],
+                        eps=eps,
+                        n_threads=n_threads,
+                        upsample_factor=upsample_factor,
+                        plan=type3_plan,
+                        out=vis_out,
+                    )
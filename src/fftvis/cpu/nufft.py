@@ -6,7 +6,64 @@ This module provides CPU-specific NUFFT functionality using the finufft library.
 
 import numpy as np
 import finufft
-from typing import Literal
+from typing import Literal, Union
+
+
+def cpu_nufft_plan(
+    nufft_type: int,
+    n_modes_or_dim: Union[int, tuple],
+    n_trans: int,
+    eps: float,
+    dtype: np.dtype = np.complex128,
+    n_threads: int = 1,
+    upsample_factor: Literal[1.25, 2] = 2,
+    nufft_opts: dict = None,
+) -> finufft.Plan:
+    """
+    Create a reusable finufft plan on the CPU.
+
+    Building the plan once and only updating the non-uniform points for each new
+    set of source/baseline coordinates avoids repeating the plan setup for every
+    transform.
+
+    Parameters
+    ----------
+    nufft_type : int
+        Type of the non-uniform FFT (1, 2 or 3).
+    n_modes_or_dim : int or tuple of ints
+        Number of modes in each dimension for type 1 and type 2 transforms, or the
+        number of dimensions for type 3 transforms.
+    n_trans : int
+        Number of transforms computed simultaneously (e.g. the number of feed pairs).
+    eps : float
+        Desired accuracy of the transform.
+    dtype : np.dtype
+        Complex data type of the transform, either complex64 or complex128.
+    n_threads : int
+        Number of threads to use.
+    upsample_factor : default = 2
+        Upsampling factor for the non-uniform FFT.
+    nufft_opts : dict, optional
+        Extra options passed to the finufft plan (e.g. spread_sort).
+
+    Returns
+    -------
+    finufft.Plan
+        Plan with no non-uniform points set.
+    """
+    return finufft.Plan(
+        nufft_type,
+        n_modes_or_dim,
+        n_trans=n_trans,
+        eps=eps,
+        dtype=np.dtype(dtype).name,
+        modeord=1 if nufft_type == 1 else 0,
+        nthreads=n_threads,
+        showwarn=0,
+        upsampfac=upsample_factor,
+        **(nufft_opts or {}),
+    )
+
 
 def cpu_nufft2d(
     x: np.ndarray,
@@ -17,6 +74,8 @@ def cpu_nufft2d(
     eps: float,
     n_threads: int = 1,
     upsample_factor: Literal[1.25, 2] = 2,
+    plan: finufft.Plan = None,
+    out: np.ndarray = None,
 ) -> np.ndarray:
     """
     Perform a 2D non-uniform FFT on the CPU.
@@ -39,12 +98,23 @@ def cpu_nufft2d(
         Upsampling factor for the non-uniform FFT.
     n_threads : int
         Number of threads to use.
+    plan : finufft.Plan, optional
+        A 2D type 3 plan created with :func:`cpu_nufft_plan`. If provided, the
+        transform is computed by updating the points of the plan instead of
+        creating a new one, and eps, n_threads and upsample_factor are ignored.
+    out : np.ndarray, optional
+        Array of shape (n_trans, nbls) to write the visibilities into. If None, a
+        new array is allocated.
 
     Returns
     -------
     np.ndarray
         Visibility data.
     """
+    if plan is not None:
+        plan.setpts(x, y, s=np.ascontiguousarray(u), t=np.ascontiguousarray(v))
+        return plan.execute(weights, out=out)
+
     return finufft.nufft2d3(
         x,
         y,
@@ -56,6 +126,7 @@ def cpu_nufft2d(
         nthreads=n_threads,
         showwarn=0,
         upsampfac=upsample_factor,
+        out=out,
     )
 
 
@@ -70,6 +141,8 @@ def cpu_nufft3d(
     eps: float,
     upsample_factor: int = 2,
     n_threads: int = 1,
+    plan: finufft.Plan = None,
+    out: np.ndarray = None,
 ) -> np.ndarray:
     """
     Perform a 3D non-uniform FFT on the CPU.
@@ -96,12 +169,30 @@ def cpu_nufft3d(
         Upsampling factor for the non-uniform FFT.
     n_threads : int
         Number of threads to use.
+    plan : finufft.Plan, optional
+        A 3D type 3 plan created with :func:`cpu_nufft_plan`. If provided, the
+        transform is computed by updating the points of the plan instead of
+        creating a new one, and eps, n_threads and upsample_factor are ignored.
+    out : np.ndarray, optional
+        Array of shape (n_trans, nbls) to write the visibilities into. If None, a
+        new array is allocated.
 
     Returns
     -------
     np.ndarray
         Visibility data.
     """
+    if plan is not None:
+        plan.setpts(
+            x,
+            y,
+            z,
+            s=np.ascontiguousarray(u),
+            t=np.ascontiguousarray(v),
+            u=np.ascontiguousarray(w),
+        )
+        return plan.execute(weights, out=out)
+
     return finufft.nufft3d3(
         x,
         y,
@@ -115,6 +206,7 @@ def cpu_nufft3d(
         nthreads=n_threads,
         showwarn=0,
         upsampfac=upsample_factor,
+        out=out,
     )
 
 def cpu_nufft2d_type1(
@@ -126,6 +218,9 @@ def cpu_nufft2d_type1(
     eps: float,
     upsample_factor: int = 2,
     n_threads: int = 1,
+    plan: finufft.Plan = None,
+    out: np.ndarray = None,
+    model_out: np.ndarray = None,
 ) -> np.ndarray:
     """
     Perform a 2D non-uniform FFT of type 1 on the CPU.
@@ -144,14 +239,29 @@ def cpu_nufft2d_type1(
         This value should be at least as large as the maximum difference between the 
         largest and smallest index values in the index array.
     index : np.ndarray
-        2D array of indices to select specific modes from the 2D transform.
-        The shape of index should be (2, n_modes).
+        Indices of the modes to select from the 2D transform. Either a 2D array of
+        shape (2, nbls) holding the two mode indices of each baseline, or a 1D
+        array of flat indices into the (n_modes, n_modes) transform (as returned
+        by ``np.ravel_multi_index(index, (n_modes, n_modes), mode="wrap")``).
+        Passing flat indices avoids recomputing them for every transform.
     eps : float
         Desired accuracy of the transform.
     upsample_factor : default = 2
         Upsampling factor for the non-uniform FFT.
     n_threads : int
         Number of threads to use.
+    plan : finufft.Plan, optional
+        A 2D type 1 plan with (n_modes, n_modes) modes created with
+        :func:`cpu_nufft_plan`. If provided, the transform is computed by updating
+        the points of the plan instead of creating a new one, and eps, n_threads
+        and upsample_factor are ignored.
+    out : np.ndarray, optional
+        Array of shape (n_trans, nbls) to write the visibilities into. If None, a
+        new array is allocated.
+    model_out : np.ndarray, optional
+        Array of shape (n_trans, n_modes, n_modes) to write the full transform
+        into before the modes are selected. Only used together with ``plan``. If
+        None, a new array is allocated.
 
     Returns
     -------
@@ -159,17 +269,23 @@ def cpu_nufft2d_type1(
         Visibility data.
     """
     # Model is a 2D array of shape (n_modes, n_modes)
-    model = finufft.nufft2d1(
-        x,
-        y,
-        weights,
-        n_modes,
-        modeord=1,
-        eps=eps,
-        nthreads=n_threads,
-        showwarn=0,
-        upsampfac=upsample_factor,
-    )
+    if plan is not None:
+        plan.setpts(x, y)
+        model = plan.execute(weights, out=model_out)
+    else:
+        model = finufft.nufft2d1(
+            x,
+            y,
+            weights,
+            n_modes,
+            modeord=1,
+            eps=eps,
+            nthreads=n_threads,
+            showwarn=0,
+            upsampfac=upsample_factor,
+        )
 
     # Select specific indices from the model
-    return model[..., index[0], index[1]]
\ No newline at end of file
+    if np.ndim(index) != 1:
+        index = np.ravel_multi_index(index, (n_modes, n_modes), mode="wrap")
+    return np.take(model.reshape(model.shape[:-2] + (-1,)), index, axis=-1, out=out)
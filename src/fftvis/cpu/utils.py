@@ -2,7 +2,7 @@ import numpy as np
 import numba as nb
 
 
-@nb.jit(nopython=True)
+@nb.jit(nopython=True, nogil=True)
 def inplace_rot(rot: np.ndarray, b: np.ndarray):  # pragma: no cover
     """
     CPU implementation of in-place rotation of coordinates using Numba.
@@ -94,13 +94,15 @@ def simulate_vis(
     precision: int = 2,
     polarized: bool = False,
     eps: float = None,
-    upsample_factor: Literal[1.25, 2] = 2,
+    upsample_factor: Literal[1.25, 2] | None = None,
+    nufft_opts: dict | None = None,
     beam_spline_opts: dict = None,
     use_feed: str = "x",
     flat_array_tol: float = 1e-6,
     interpolation_function: str = "az_za_map_coordinates",
     nprocesses: int | None = 1,
     nthreads: int | None = None,
+    nthreads_per_nufft: int | None = None,
     coord_method: Literal[
         "CoordinateRotationAstropy", "CoordinateRotationERFA"
     ] = "CoordinateRotationERFA",
@@ -151,11 +153,18 @@ def simulate_vis(
         Desired accuracy of the non-uniform fast fourier transform. If None, the default accuracy
         for the given precision will be used. For precision 1, the default accuracy is 6e-8, and for
         precision 2, the default accuracy is 1e-12.
-    upsample_factor : int, default = 2
+    upsample_factor : default = None
         Upsampling factor for the non-uniform fast fourier transform. This is the factor by which the
-        intermediate grid is upsampled. Only values of 1.25 or 2 are allowed. Can be useful for decreasing
-        the computation time and memory requirement for large arrays at the expensive of some accuracy. 
-        The default value is 2.
+        intermediate grid is upsampled. Only values of 1.25 or 2 are allowed. A factor of 1.25 uses a
+        smaller fine grid (about 2.6 times less memory in 2D) and is usually faster, but requires a wider
+        spreading kernel and does not reach accuracies much below 1e-9. If None, 1.25 is used when
+        eps >= 1e-6 and 2 otherwise.
+    nufft_opts : dict, optional
+        Extra options passed to the finufft plans, e.g. ``{"spread_sort": 0}`` to
+        skip sorting the non-uniform points when there are only few sources, or
+        ``{"spread_thread": 2}``. See the finufft documentation for the available
+        options. These can't include the options set by fftvis (eps, nthreads,
+        upsampfac, modeord and dtype).
     beam_spline_opts : dict, optional
         Options to pass to :meth:`pyuvdata.uvbeam.UVBeam.interp` as `spline_opts`.
     use_feed : str, default = "x"
@@ -176,6 +185,13 @@ def simulate_vis(
     nthreads : int, optional
         The number of threads to use for each process. If None, the number of threads
         will be set to the number of available CPUs divided by the number of processes.
+    nthreads_per_nufft : int, optional
+        The number of threads used by each non-uniform FFT. If None, each transform
+        uses all the threads of its process and integration times are evaluated one
+        after the other. If smaller than the number of threads per process, the
+        integration times of each process are evaluated concurrently, using
+        ``nthreads // nthreads_per_nufft`` threads. This is faster when the
+        individual transforms are too small to make use of many threads.
     coord_method : str, optional
         The method to use for coordinate rotation. Can be either 'CoordinateRotationAstropy'
         or 'CoordinateRotationERFA'. The former uses the astropy.coordinates package for
@@ -245,11 +261,13 @@ def simulate_vis(
         polarized=polarized,
         eps=eps,
         upsample_factor=upsample_factor,
+        nufft_opts=nufft_opts,
         beam_spline_opts=beam_spline_opts,
         flat_array_tol=flat_array_tol,
         interpolation_function=interpolation_function,
         nprocesses=nprocesses,
         nthreads=nthreads,
+        nthreads_per_nufft=nthreads_per_nufft,
         coord_method=coord_method,
         coord_method_params=coord_method_params,
         force_use_type3=force_use_type3,
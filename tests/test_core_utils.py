@@ -88,6 +88,32 @@ def test_get_pos_reds():
     assert autos_found
 
 
+def test_get_pos_reds_orientation():
+    """Test that conjugate baselines are grouped and oriented consistently."""
+    ants = {
+        0: np.array([0.0, 0.0, 0.0]),
+        1: np.array([10.0, 10.0, 0.0]),
+        2: np.array([-10.0, -10.0, 0.0]),
+        3: np.array([10.0, 0.0, 0.0]),
+    }
+    reds = get_pos_reds(ants, include_autos=True)
+
+    # Groups are ordered by their first baseline
+    assert reds[0] == [(0, 0), (1, 1), (2, 2), (3, 3)]
+
+    # The (0, 2) baseline is the conjugate of (0, 1) and is flipped into its group
+    assert reds[1] == [(0, 1), (2, 0)]
+
+    # Groups are oriented such that the first baseline has a non-negative y
+    for red in reds:
+        ant1, ant2 = red[0]
+        assert ants[ant2][1] - ants[ant1][1] >= 0
+        for bl in red:
+            np.testing.assert_allclose(
+                ants[bl[1]] - ants[bl[0]], ants[ant2] - ants[ant1]
+            )
+
+
 def test_get_plane_to_xy_rotation_matrix():
     """Test that get_plane_to_xy_rotation_matrix works as expected."""
     # Create antenna positions all lying in the XY-plane
@@ -699,3 +699,39 @@ def test_evaluate_beam_additional_paths():
     )
     
     assert not np.isnan(result_simple).any()
+
+
+@pytest.mark.parametrize("polarized", [True, False])
+def test_evaluate_beam_freqs(polarized):
+    """Test that evaluating several frequencies at once matches single evaluations."""
+    from pyuvdata import AiryBeam
+
+    beam = BeamInterface(
+        AiryBeam(diameter=14.0), beam_type="efield" if polarized else "power"
+    )
+    az = np.linspace(0, 2 * np.pi, 20)
+    za = np.linspace(0, np.pi / 2.0, 20)
+    freqs = np.array([100e6, 150e6, 200e6])
+
+    cpu_evaluator = CPUBeamEvaluator()
+    beam_freqs = cpu_evaluator.evaluate_beam_freqs(beam, az, za, polarized, freqs)
+    assert beam_freqs.shape == ((3, 2, 2, 20) if polarized else (3, 20))
+
+    for fi, freq in enumerate(freqs):
+        np.testing.assert_allclose(
+            beam_freqs[fi],
+            cpu_evaluator.evaluate_beam(beam, az, za, polarized, freq),
+        )
+
+
+def test_get_apparent_flux_polarized_beam_complex():
+    """Test the apparent flux of unpolarized sources for a complex polarized beam."""
+    rng = np.random.default_rng(0)
+    beam = rng.normal(size=(2, 2, 5)) + 1j * rng.normal(size=(2, 2, 5))
+    flux = rng.uniform(size=5) + 0j
+
+    appflux = np.einsum("bas,s,bcs->acs", beam.conj(), flux, beam)
+    CPUBeamEvaluator.get_apparent_flux_polarized_beam(beam, flux)
+
+    np.testing.assert_allclose(beam, appflux)
+    np.testing.assert_allclose(beam[0, 0].imag, 0)
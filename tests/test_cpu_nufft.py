@@ -0,0 +1,121 @@
+import pytest
+import warnings
+import numpy as np
+from fftvis.cpu.nufft import cpu_nufft_plan, cpu_nufft2d, cpu_nufft3d, cpu_nufft2d_type1
+
+
+@pytest.mark.parametrize("precision", [1, 2])
+def test_cpu_nufft2d_plan_matches_direct(precision):
+    """Test that reusing a type 3 plan gives the same result as a direct call."""
+    rng = np.random.default_rng(42)
+    real_dtype = np.float32 if precision == 1 else np.float64
+    complex_dtype = np.complex64 if precision == 1 else np.complex128
+    eps = 1e-6 if precision == 1 else 1e-12
+
+    x, y = rng.uniform(-np.pi, np.pi, size=(2, 50)).astype(real_dtype)
+    weights = rng.normal(size=(4, 50)).astype(complex_dtype)
+    plan = cpu_nufft_plan(3, 2, n_trans=4, eps=eps, dtype=complex_dtype)
+
+    # Update the points of the same plan for several sets of baselines
+    for scale in [1.0, 2.0]:
+        u, v = scale * rng.uniform(-10, 10, size=(2, 7)).astype(real_dtype)
+        direct = cpu_nufft2d(x, y, weights, u, v, eps=eps)
+        planned = cpu_nufft2d(x, y, weights, u, v, eps=eps, plan=plan)
+        assert planned.shape == (4, 7)
+        np.testing.assert_allclose(planned, direct, atol=10 * eps * np.abs(weights).sum())
+
+
+def test_cpu_nufft3d_plan_matches_direct():
+    """Test that a 3D type 3 plan gives the same result as a direct call."""
+    rng = np.random.default_rng(42)
+    eps = 1e-12
+
+    x, y, z = rng.uniform(-np.pi, np.pi, size=(3, 50))
+    weights = rng.normal(size=(1, 50)) + 0j
+    u, v, w = rng.uniform(-10, 10, size=(3, 7))
+    plan = cpu_nufft_plan(3, 3, n_trans=1, eps=eps)
+
+    direct = cpu_nufft3d(x, y, z, weights, u, v, w, eps=eps)
+    planned = cpu_nufft3d(x, y, z, weights, u, v, w, eps=eps, plan=plan)
+    np.testing.assert_allclose(planned, direct, atol=1e-10)
+
+
+def test_cpu_nufft2d_type1_flat_index():
+    """Test that flat mode indices select the same modes as 2D indices."""
+    rng = np.random.default_rng(42)
+    n_modes = 7
+    x, y = rng.uniform(-np.pi, np.pi, size=(2, 50))
+    weights = rng.normal(size=(4, 50)) + 0j
+    index = rng.integers(-3, 4, size=(2, 10))
+    flat_index = np.ravel_multi_index(index, (n_modes, n_modes), mode="wrap")
+
+    kwargs = dict(n_modes=n_modes, eps=1e-12)
+    vis = cpu_nufft2d_type1(x, y, weights, index=index, **kwargs)
+    vis_flat = cpu_nufft2d_type1(x, y, weights, index=flat_index, **kwargs)
+    assert vis_flat.shape == (4, 10)
+    np.testing.assert_allclose(vis_flat, vis)
+
+
+def test_cpu_nufft2d_type1_plan_matches_direct():
+    """Test that reusing a type 1 plan gives the same result as a direct call."""
+    rng = np.random.default_rng(42)
+    n_modes = 7
+    index = rng.integers(-3, 4, size=(2, 10))
+    weights = rng.normal(size=(4, 50)) + 0j
+    plan = cpu_nufft_plan(1, (n_modes, n_modes), n_trans=4, eps=1e-12)
+
+    for scale in [1.0, 0.5]:
+        x, y = scale * rng.uniform(-np.pi, np.pi, size=(2, 50))
+        kwargs = dict(n_modes=n_modes, index=index, eps=1e-12)
+        direct = cpu_nufft2d_type1(x, y, weights, **kwargs)
+        planned = cpu_nufft2d_type1(x, y, weights, plan=plan, **kwargs)
+        np.testing.assert_allclose(planned, direct, atol=1e-10)
+
+
+def test_cpu_nufft_plan_strided_baselines():
+    """Test that strided baseline coordinates are passed to a plan without warnings."""
+    rng = np.random.default_rng(42)
+    eps = 1e-12
+    x, y, z = rng.uniform(-np.pi, np.pi, size=(3, 50))
+    weights = rng.normal(size=(1, 50)) + 0j
+
+    # Rows of a Fortran-ordered table are not contiguous
+    u, v, w = np.asfortranarray(rng.uniform(-10, 10, size=(3, 7)))
+    assert not u.flags.c_contiguous
+
+    plan2d = cpu_nufft_plan(3, 2, n_trans=1, eps=eps)
+    plan3d = cpu_nufft_plan(3, 3, n_trans=1, eps=eps)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        planned2d = cpu_nufft2d(x, y, weights, u, v, eps=eps, plan=plan2d)
+        planned3d = cpu_nufft3d(x, y, z, weights, u, v, w, eps=eps, plan=plan3d)
+
+    np.testing.assert_allclose(
+        planned2d, cpu_nufft2d(x, y, weights, u, v, eps=eps), atol=1e-10
+    )
+    np.testing.assert_allclose(
+        planned3d, cpu_nufft3d(x, y, z, weights, u, v, w, eps=eps), atol=1e-10
+    )
+
+
+def test_cpu_nufft2d_type1_model_out():
+    """Test that the full type 1 transform can be written into a given array."""
+    rng = np.random.default_rng(42)
+    n_modes = 7
+    index = rng.integers(-3, 4, size=(2, 10))
+    x, y = rng.uniform(-np.pi, np.pi, size=(2, 50))
+    weights = rng.normal(size=(4, 50)) + 0j
+    plan = cpu_nufft_plan(1, (n_modes, n_modes), n_trans=4, eps=1e-12)
+    model_out = np.zeros((4, n_modes, n_modes), dtype=complex)
+
+    kwargs = dict(n_modes=n_modes, index=index, eps=1e-12)
+    planned = cpu_nufft2d_type1(
+        x, y, weights, plan=plan, model_out=model_out, **kwargs
+    )
+    np.testing.assert_allclose(
+        planned, cpu_nufft2d_type1(x, y, weights, **kwargs), atol=1e-10
+    )
+
+    # The transform was computed in the given array
+    flat_index = np.ravel_multi_index(index, (n_modes, n_modes), mode="wrap")
+    np.testing.assert_array_equal(model_out.reshape(4, -1)[:, flat_index], planned)
@@ -3,6 +3,7 @@ import ray
 import sys
 import os
 import logging
+import threading
 import numpy as np
 from astropy.time import Time
 from astropy.coordinates import EarthLocation, SkyCoord, Latitude, Longitude
@@ -336,6 +337,266 @@ def test_sim_polarized_sky(use_analytic_beam):
             fftvis_data,
         )
 
+@pytest.mark.parametrize("polarized", [False, True])
+@pytest.mark.parametrize("force_use_type3", [False, True])
+@pytest.mark.parametrize("nfreq", [1, 2])
+def test_simulate_concurrent_times(polarized, force_use_type3, nfreq):
+    """Test that evaluating times concurrently matches the serial evaluation."""
+    params, *_ = get_standard_sim_params(
+        use_analytic_beam=True, polarized=polarized, nfreq=nfreq
+    )
+    params.pop("ants")
+    beam = params.pop("beams")[0]
+    ants = _square_grid()
+
+    # Spread the times over most of a day with a different flux for every
+    # source, so that the sources above the horizon (and their order) change
+    # between times, and each time the flux in the buffers of the coordinate
+    # manager is changed
+    t0 = params.pop("times").jd[0]
+    times = np.linspace(t0, t0 + 0.9, 6)
+    rng = np.random.default_rng(7)
+    params["fluxes"] = rng.uniform(0.5, 2.0, size=params["fluxes"].shape)
+
+    kwargs = dict(
+        ants=ants,
+        eps=1e-10,
+        coord_method_params={"source_buffer": 0.75},
+        beam=beam,
+        times=times,
+        nthreads=2,
+        force_use_type3=force_use_type3,
+        **params,
+    )
+    serial_vis = simulate_vis(**kwargs)
+    concurrent_vis = simulate_vis(nthreads_per_nufft=1, **kwargs)
+
+    np.testing.assert_allclose(concurrent_vis, serial_vis, atol=1e-12)
+
+
+def test_simulate_concurrent_times_own_beam_evaluator(monkeypatch):
+    """Test that concurrent time workers don't share a beam evaluator."""
+    from fftvis.cpu.beams import CPUBeamEvaluator
+
+    params, *_ = get_standard_sim_params(
+        use_analytic_beam=True, polarized=False, ntime=6
+    )
+    params["beam"] = params.pop("beams")[0]
+
+    threads_of_evaluator = {}
+    evaluate_beam_freqs = CPUBeamEvaluator.evaluate_beam_freqs
+
+    def recording_evaluate_beam_freqs(self, *args, **kwargs):
+        threads_of_evaluator.setdefault(id(self), set()).add(threading.get_ident())
+        return evaluate_beam_freqs(self, *args, **kwargs)
+
+    monkeypatch.setattr(
+        CPUBeamEvaluator, "evaluate_beam_freqs", recording_evaluate_beam_freqs
+    )
+    simulate_vis(
+        coord_method_params={"source_buffer": 0.75},
+        nthreads=2,
+        nthreads_per_nufft=1,
+        **params,
+    )
+
+    assert threads_of_evaluator
+    assert all(len(threads) == 1 for threads in threads_of_evaluator.values())
+
+
+def test_simulate_flat_type3_skips_rotation(monkeypatch):
+    """Test that flat type 3 arrays only scale the sources instead of rotating them."""
+    from fftvis.cpu import utils as cpu_utils
+
+    params, *_ = get_standard_sim_params(use_analytic_beam=True, polarized=False)
+    params.pop("ants")
+    params["beam"] = params.pop("beams")[0]
+    kwargs = dict(
+        ants=_square_grid(),
+        eps=1e-10,
+        coord_method_params={"source_buffer": 0.75},
+        **params,
+    )
+    type1_vis = simulate_vis(**kwargs)
+
+    def inplace_rot(rot, b):
+        raise AssertionError("flat type 3 arrays should not rotate the sources")
+
+    monkeypatch.setattr(cpu_utils, "inplace_rot", inplace_rot)
+    type3_vis = simulate_vis(force_use_type3=True, **kwargs)
+    np.testing.assert_allclose(type3_vis, type1_vis, atol=1e-8)
+
+
+@pytest.mark.filterwarnings("error:Argument .* does not satisfy:UserWarning")
+@pytest.mark.parametrize("flat", [False, True])
+def test_simulate_type3_contiguous_baselines(flat):
+    """Test that the type 3 plans are given contiguous baseline coordinates."""
+    params, *_ = get_standard_sim_params(
+        use_analytic_beam=True, polarized=False, nfreq=3, ntime=4
+    )
+    params.pop("ants")
+    params["beam"] = params.pop("beams")[0]
+    ants = _square_grid()
+    if not flat:
+        ants = {ant: pos + [0.0, 0.0, 0.1 * ant] for ant, pos in ants.items()}
+
+    # finufft copies (and warns about) baseline coordinates that aren't contiguous
+    simulate_vis(
+        ants=ants,
+        coord_method_params={"source_buffer": 0.75},
+        force_use_type3=True,
+        **params,
+    )
+
+
+def test_simulate_freq_chunk_offset(monkeypatch):
+    """Test that a chunk of frequencies not starting at zero is evaluated correctly."""
+    params, *_ = get_standard_sim_params(
+        use_analytic_beam=True, polarized=False, nfreq=3
+    )
+    kwargs = dict(
+        eps=1e-10, coord_method_params={"source_buffer": 0.75}, **params
+    )
+    kwargs["beam"] = kwargs.pop("beams")[0]
+    full_vis = simulate_vis(**kwargs)
+
+    # Only evaluate the last two frequencies in a single chunk
+    def get_task_chunks(nprocesses, nfreqs, ntimes):
+        return 1, [slice(1, nfreqs)], [slice(None)], nfreqs - 1, ntimes
+
+    monkeypatch.setattr(utils, "get_task_chunks", get_task_chunks)
+    chunk_vis = simulate_vis(**kwargs)
+
+    np.testing.assert_allclose(chunk_vis[1:], full_vis[1:])
+    assert np.all(chunk_vis[0] == 0)
+
+
+def test_simulate_default_upsample_factor():
+    """Test that the smaller upsampling factor is used by default for low accuracies."""
+    params, *_ = get_standard_sim_params(use_analytic_beam=True, polarized=False)
+    params["beam"] = params.pop("beams")[0]
+    kwargs = dict(eps=1e-6, coord_method_params={"source_buffer": 0.75}, **params)
+
+    default_vis = simulate_vis(**kwargs)
+    np.testing.assert_array_equal(
+        default_vis, simulate_vis(upsample_factor=1.25, **kwargs)
+    )
+    np.testing.assert_allclose(
+        default_vis,
+        simulate_vis(upsample_factor=2, **kwargs),
+        atol=1e-4 * np.abs(default_vis).max(),
+    )
+
+
+@pytest.mark.parametrize("force_use_type3", [False, True])
+def test_simulate_nufft_opts(force_use_type3):
+    """Test that extra finufft options are passed to the plans."""
+    params, *_ = get_standard_sim_params(use_analytic_beam=True, polarized=False)
+    params.pop("ants")
+    params["beam"] = params.pop("beams")[0]
+    kwargs = dict(
+        ants=_square_grid(),
+        eps=1e-10,
+        coord_method_params={"source_buffer": 0.75},
+        force_use_type3=force_use_type3,
+        **params,
+    )
+    vis = simulate_vis(**kwargs)
+    unsorted_vis = simulate_vis(nufft_opts={"spread_sort": 0}, **kwargs)
+    np.testing.assert_allclose(unsorted_vis, vis, atol=1e-12)
+
+    # finufft warns about options it doesn't know
+    with pytest.warns(Warning, match="not_an_option"):
+        simulate_vis(nufft_opts={"not_an_option": 1}, **kwargs)
+
+
+def test_get_scratch():
+    """Test that scratch buffers are reused between calls."""
+    from fftvis.cpu.cpu_simulate import _get_scratch
+
+    workspace = threading.local()
+    a = _get_scratch(workspace, "buf", (2, 10), np.complex128)
+    assert a.shape == (2, 10) and a.flags.c_contiguous
+
+    # Smaller arrays share the memory of the existing buffer
+    b = _get_scratch(workspace, "buf", (2, 5), np.complex128)
+    assert np.shares_memory(a, b)
+
+    # Larger arrays or other dtypes get a new buffer
+    c = _get_scratch(workspace, "buf", (2, 20), np.complex128)
+    assert not np.shares_memory(a, c)
+    d = _get_scratch(workspace, "buf", (2, 5), np.float64)
+    assert d.dtype == np.float64
+
+
+@pytest.mark.parametrize("polarized", [False, True])
+def test_simulate_beam_buffer_only_when_needed(monkeypatch, polarized):
+    """Test that the beam is only copied into scratch if it isn't usable as is."""
+    from fftvis.cpu import cpu_simulate
+
+    params, *_ = get_standard_sim_params(
+        use_analytic_beam=True, polarized=polarized, nfreq=2
+    )
+    params["beam"] = params.pop("beams")[0]
+
+    requested = []
+    get_scratch = cpu_simulate._get_scratch
+
+    def recording_get_scratch(workspace, name, shape, dtype):
+        requested.append(name)
+        return get_scratch(workspace, name, shape, dtype)
+
+    monkeypatch.setattr(cpu_simulate, "_get_scratch", recording_get_scratch)
+    simulate_vis(coord_method_params={"source_buffer": 0.75}, **params)
+
+    # Unpolarized power beams are already contiguous real arrays, while the
+    # polarized beam has its axes moved
+    assert ("beam_buffer" in requested) == polarized
+
+
+@pytest.mark.parametrize("polarized", [False, True])
+def test_simulate_output_contiguous(polarized):
+    """Test that the simulated visibilities are returned as a contiguous array."""
+    params, *_ = get_standard_sim_params(
+        use_analytic_beam=True, polarized=polarized, nfreq=2
+    )
+    params["beam"] = params.pop("beams")[0]
+    vis = simulate_vis(coord_method_params={"source_buffer": 0.75}, **params)
+
+    nbls = len(utils.get_pos_reds(params["ants"], include_autos=True))
+    if polarized:
+        assert vis.shape == (2, len(params["times"]), 2, 2, nbls)
+    else:
+        assert vis.shape == (2, len(params["times"]), nbls)
+    assert vis.flags.c_contiguous
+
+
+def test_simulate_caches_array_layout():
+    """Test that the array layout is reused between simulations of the same array."""
+    from fftvis.cpu import cpu_simulate
+
+    params, *_ = get_standard_sim_params(use_analytic_beam=True, polarized=False)
+    params.pop("ants")
+    params["beam"] = params.pop("beams")[0]
+    kwargs = dict(
+        ants=_square_grid(), coord_method_params={"source_buffer": 0.75}, **params
+    )
+
+    cpu_simulate._get_redundant_baselines.cache_clear()
+    cpu_simulate._check_antpos_griddability.cache_clear()
+    vis = simulate_vis(**kwargs)
+    vis_again = simulate_vis(**kwargs)
+
+    # The cached (gridded) layout is not modified by the first simulation
+    np.testing.assert_array_equal(vis_again, vis)
+    assert cpu_simulate._get_redundant_baselines.cache_info().hits == 1
+    assert cpu_simulate._check_antpos_griddability.cache_info().hits == 1
+
+    # A different array is not taken from the cache
+    simulate_vis(**{**kwargs, "ants": _square_grid(spacing=12.0)})
+    assert cpu_simulate._get_redundant_baselines.cache_info().misses == 2
+
+
 def test_cpu_simulation_engine_init():
     """Test that the CPUSimulationEngine initializes correctly."""
     engine = CPUSimulationEngine()